@@ -1,136 +1,483 @@
 import asyncio
-import pandas as pd
+import csv
+import json
 from tqdm.asyncio import tqdm
 import os
-import requests
-from bs4 import BeautifulSoup
+import aiohttp
+from bs4 import BeautifulSoup, SoupStrainer
 from datetime import datetime
 import aiodns
-import aiofiles
 import logging
-
-# Set event loop policy for Windows
+import logging.handlers
+import queue
+import socket
+from concurrent.futures import ThreadPoolExecutor
+import sqlite3
+import time
+from types import SimpleNamespace
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import dns.asyncresolver
+    import dns.exception
+    import dns.resolver
+except ImportError:
+    dns = None
+
+# Set event loop policy for Windows, and use uvloop elsewhere when it is installed
 if os.name == 'nt':
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+else:
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+
+logger = logging.getLogger(__name__)
+
+# Columns of the resolution results
+RESULT_FIELDS = ["Hostname", "IPAddresses", "CountryCode", "Network", "Status"]
+
+# Write buffer size for the results CSV
+OUTPUT_BUFFER_SIZE = 1 << 20
+# Total time (in seconds) allowed for downloading the MCC/MNC table
+SCRAPE_TIMEOUT = 10
+
+# Default number of in-flight DNS lookups; c-ares multiplexes these over a single socket
+DEFAULT_CONCURRENCY = 1024
+# Transient resolver errors worth retrying with the OS resolver
+RETRY_ERRORS = (aiodns.error.ARES_ETIMEOUT, aiodns.error.ARES_ECONNREFUSED, aiodns.error.ARES_ECANCELLED)
+# Resolver errors that are a definite answer that the name has no records
+NEGATIVE_ERRORS = (aiodns.error.ARES_ENOTFOUND, aiodns.error.ARES_ENODATA)
+# Per-try timeout (in seconds) and number of tries given to the resolver itself
+RESOLVER_TIMEOUT = 2
+RESOLVER_TRIES = 2
+# Upper bound (in seconds) on a getaddrinfo fallback once it has a thread
+FALLBACK_TIMEOUT = RESOLVER_TIMEOUT * RESOLVER_TRIES
+# Threads available to the OS resolver fallback
+FALLBACK_WORKERS = 64
+
+# Number of completed lookups collected before the progress bar is redrawn
+PROGRESS_BATCH = 32
+
+# Every ePDG hostname follows this template, filled in with (MNC, MCC)
+HOSTNAME_TEMPLATE = "epdg.epc.mnc%03d.mcc%03d.pub.3gppnetwork.org"
+# How long (in seconds) an MCC/MNC that does not exist in DNS is skipped on later runs
+FAILED_LOOKUP_MAX_AGE = 7 * 24 * 60 * 60
+
+# Outcome of a hostname lookup, written to the Status column of the results
+STATUS_RESOLVED = "resolved"
+STATUS_NOT_FOUND = "not found"
+STATUS_ERROR = "error"
+STATUS_CACHED = "skipped (cached not found)"
+
+class DnspythonResolver:
+    """
+    Minimal aiodns-compatible wrapper around dnspython's resolver for A/AAAA lookups.
 
-# Asynchronous function to resolve the DNS chain
-async def resolve_name_chain(resolver, hostname, log_file, resolved_names=None, resolved_ips=None):
-    if resolved_names is None:
-        resolved_names = []
-    if resolved_ips is None:
-        resolved_ips = []
+    Used on Windows, where aiodns is unreliable on some configurations. Answers
+    are returned in the same shape as aiodns and failures raised as DNSError.
+    """
 
-    if hostname in resolved_names:
-        return resolved_names, resolved_ips  # Avoid infinite loops
+    def __init__(self, timeout=2, tries=2):
+        self._resolver = dns.asyncresolver.Resolver()
+        self._resolver.timeout = timeout
+        self._resolver.lifetime = timeout * tries
+
+    async def query(self, hostname, rtype):
+        try:
+            answer = await self._resolver.resolve(hostname, rtype)
+        except dns.resolver.NXDOMAIN as e:
+            raise aiodns.error.DNSError(aiodns.error.ARES_ENOTFOUND, str(e))
+        except dns.resolver.NoAnswer as e:
+            raise aiodns.error.DNSError(aiodns.error.ARES_ENODATA, str(e))
+        except dns.exception.Timeout as e:
+            raise aiodns.error.DNSError(aiodns.error.ARES_ETIMEOUT, str(e))
+        except dns.exception.DNSException as e:
+            raise aiodns.error.DNSError(aiodns.error.ARES_ESERVFAIL, str(e))
+
+        ttl = answer.rrset.ttl
+        return [SimpleNamespace(host=record.address, ttl=ttl) for record in answer]
+
+    @property
+    def nameservers(self):
+        return self._resolver.nameservers
+
+    async def close(self):
+        pass
+
+# Resolver shared by every lookup, created on first use by get_resolver()
+_resolver = None
+
+def get_resolver():
+    """
+    Returns the shared resolver, creating it on first use.
+
+    A single aiodns resolver owns one c-ares channel, which keeps one set of
+    sockets open and multiplexes all concurrent queries over it by transaction
+    ID, so every lookup in a run reuses it. The channel is bound to the running
+    event loop, so main() closes it with close_resolver() at the end of each run
+    and the next run creates a fresh one.
+    On Windows dnspython is preferred when it is installed.
+    """
+    global _resolver
+    if _resolver is None:
+        if os.name == 'nt' and dns is not None:
+            _resolver = DnspythonResolver(timeout=RESOLVER_TIMEOUT, tries=RESOLVER_TRIES)
+        else:
+            _resolver = aiodns.DNSResolver(timeout=RESOLVER_TIMEOUT, tries=RESOLVER_TRIES)
+    return _resolver
+
+# Thread pool for the OS resolver fallback, created on first use by get_fallback_executor()
+_fallback_executor = None
+# Limits fallbacks to one per pool thread. A slot is held until the getaddrinfo call
+# itself returns, even after its caller timed out, so no call waits in the pool queue
+_fallback_slots = None
+
+def get_fallback_executor():
+    """
+    Returns the bounded thread pool used for socket.getaddrinfo fallbacks.
+    """
+    global _fallback_executor, _fallback_slots
+    if _fallback_executor is None:
+        _fallback_executor = ThreadPoolExecutor(max_workers=FALLBACK_WORKERS, thread_name_prefix="dns-fallback")
+        _fallback_slots = asyncio.Semaphore(FALLBACK_WORKERS)
+    return _fallback_executor
 
-    resolved_names.append(hostname)
+async def close_resolver():
+    """
+    Closes the shared resolver and fallback thread pool, if they were created.
+    """
+    global _resolver, _fallback_executor, _fallback_slots
+    executor, _fallback_executor, _fallback_slots = _fallback_executor, None, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    resolver, _resolver = _resolver, None
+    if resolver is None:
+        return
+    if hasattr(resolver, 'close'):
+        await resolver.close()
+    else:
+        # Older aiodns releases only support cancelling outstanding queries
+        resolver.cancel()
+
+async def query_system_resolver(hostname, rtype):
+    """
+    Looks up A or AAAA records with socket.getaddrinfo on the fallback thread pool.
 
+    Answers are returned in the same shape as aiodns and failures raised as
+    DNSError. Only "no such name" and "no data" map to definite negative codes;
+    every other getaddrinfo failure, such as EAI_AGAIN, is reported as a timeout.
+    """
+    family = socket.AF_INET if rtype == 'A' else socket.AF_INET6
+    loop = asyncio.get_running_loop()
+    executor = get_fallback_executor()
+    slots = _fallback_slots
+
+    # A running getaddrinfo call cannot be cancelled, so the slot is released
+    # when the call finishes rather than when this coroutine stops waiting
+    await slots.acquire()
     try:
-        cname_result = await resolver.query(hostname, 'CNAME')
-        cname_host = cname_result.cname
-        async with aiofiles.open(log_file, 'a') as f:
-            await f.write(f"{hostname} is a CNAME for {cname_host}\n")
-        return await resolve_name_chain(resolver, cname_host, log_file, resolved_names, resolved_ips)
-    except aiodns.error.DNSError as e:
-        async with aiofiles.open(log_file, 'a') as f:
-            await f.write(f"No CNAME record for {hostname}: {e}\n")
+        call = executor.submit(socket.getaddrinfo, hostname, None, family, socket.SOCK_STREAM)
+    except BaseException:
+        slots.release()
+        raise
+
+    def release_slot(_):
+        try:
+            loop.call_soon_threadsafe(slots.release)
+        except RuntimeError:
+            pass  # The loop has already been closed
+
+    call.add_done_callback(release_slot)
 
     try:
-        result = await resolver.query(hostname, 'A')
-        ips = [ip.host for ip in result]
-        async with aiofiles.open(log_file, 'a') as f:
-            await f.write(f"{hostname} has A records: {', '.join(ips)}\n")
-        resolved_ips.extend(ips)
-    except aiodns.error.DNSError as e:
-        async with aiofiles.open(log_file, 'a') as f:
-            await f.write(f"No A records for {hostname}: {e}\n")
+        infos = await asyncio.wait_for(asyncio.wrap_future(call), timeout=FALLBACK_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise aiodns.error.DNSError(aiodns.error.ARES_ETIMEOUT, "Timeout while contacting DNS servers")
+    except socket.gaierror as e:
+        if e.errno == socket.EAI_NONAME:
+            code = aiodns.error.ARES_ENOTFOUND
+        elif e.errno == getattr(socket, 'EAI_NODATA', None):
+            code = aiodns.error.ARES_ENODATA
+        else:
+            code = aiodns.error.ARES_ETIMEOUT
+        raise aiodns.error.DNSError(code, str(e))
+    hosts = dict.fromkeys(info[4][0] for info in infos)
+    return [SimpleNamespace(host=host, ttl=0) for host in hosts]
+
+def query_timeout(resolver):
+    """
+    Returns the upper bound (in seconds) on a single query to the resolver.
 
+    c-ares tries each nameserver RESOLVER_TRIES times and doubles its timeout
+    on every retry round, so the bound scales with the number of nameservers
+    and leaves a second of slack after the resolver's own retries.
+    """
+    nameservers = max(1, len(getattr(resolver, 'nameservers', None) or ()))
+    return nameservers * RESOLVER_TIMEOUT * (2 ** RESOLVER_TRIES - 1) + 1
+
+async def query_with_fallback(resolver, hostname, rtype):
+    """
+    Queries the resolver, falling back to the OS resolver on transient failures.
+
+    The resolver already retries RESOLVER_TRIES times on its own, so a query
+    that still times out or errors is handed to getaddrinfo once instead of
+    being retried, and a partial resolver outage does not stall the whole run.
+    """
     try:
-        result = await resolver.query(hostname, 'AAAA')
-        ips = [ip.host for ip in result]
-        async with aiofiles.open(log_file, 'a') as f:
-            await f.write(f"{hostname} has AAAA records: {', '.join(ips)}\n")
-        resolved_ips.extend(ips)
+        return await asyncio.wait_for(resolver.query(hostname, rtype), timeout=query_timeout(resolver))
+    except asyncio.TimeoutError:
+        pass
     except aiodns.error.DNSError as e:
-        async with aiofiles.open(log_file, 'a') as f:
-            await f.write(f"No AAAA records for {hostname}: {e}\n")
+        if not e.args or e.args[0] not in RETRY_ERRORS:
+            raise
 
-    return resolved_names, resolved_ips
+    logger.info("Falling back to the system resolver for %s %s", hostname, rtype)
+    return await query_system_resolver(hostname, rtype)
 
-async def resolve_hostname_with_semaphore(semaphore, resolver, hostname, country_code, network, results, log_file, pbar, valid_names):
-    async with semaphore:
-        resolved_names, resolved_ips = await resolve_name_chain(resolver, hostname, log_file)
-        if resolved_ips:
-            valid_names.append(hostname)
-        results.append((hostname, resolved_ips, country_code, network))
-        pbar.update(1)
-
-async def resolve_hostnames(df, log_filename, log_dir):
-    df["hostname"] = df.apply(
-        lambda row: f"epdg.epc.mnc{int(row['MNC']):03d}.mcc{int(row['MCC']):03d}.pub.3gppnetwork.org",
-        axis=1
+# Asynchronous function to resolve the addresses of a hostname
+async def resolve_addresses(resolver, hostname):
+    """
+    Resolves the A and AAAA records of a hostname.
+
+    No separate CNAME lookup is made: the recursive resolver returns any CNAME
+    chain together with the address records, and the addresses of the final
+    target are returned directly.
+
+    Returns:
+        tuple: The resolved addresses and the lookup status. A hostname without
+        addresses is only STATUS_NOT_FOUND when both lookups got a definite
+        negative answer; timeouts and other failures give STATUS_ERROR.
+    """
+    resolved_ips = []
+    definite = True
+
+    # A and AAAA lookups are independent, so issue them concurrently
+    answers = await asyncio.gather(
+        query_with_fallback(resolver, hostname, 'A'),
+        query_with_fallback(resolver, hostname, 'AAAA'),
+        return_exceptions=True
     )
+    for rtype, result in zip(('A', 'AAAA'), answers):
+        if isinstance(result, aiodns.error.DNSError):
+            logger.info("No %s records for %s: %s", rtype, hostname, result)
+            if not result.args or result.args[0] not in NEGATIVE_ERRORS:
+                definite = False
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            ips = [ip.host for ip in result]
+            logger.info("%s has %s records: %s", hostname, rtype, ', '.join(ips))
+            resolved_ips.extend(ips)
+
+    if resolved_ips:
+        status = STATUS_RESOLVED
+    elif definite:
+        status = STATUS_NOT_FOUND
+    else:
+        status = STATUS_ERROR
+    return resolved_ips, status
 
-    hostnames = df["hostname"].tolist()
-    country_codes = df["Country Code"].tolist()
-    networks = df["Network"].tolist()
-    max_workers = min(128, len(hostnames))
-    semaphore = asyncio.Semaphore(max_workers)
-    resolver = aiodns.DNSResolver()
+async def resolve_hostname_with_semaphore(semaphore, resolver, hostname, progress, result_queue):
+    async with semaphore:
+        resolved_ips, status = await resolve_addresses(resolver, hostname)
+        result_queue.put_nowait((hostname, resolved_ips, status))
+        progress()
+        return resolved_ips, status
 
-    results = []
-    valid_names = []
+def batched_progress(pbar, batch_size=PROGRESS_BATCH):
+    """
+    Returns a callback counting completed lookups and updating pbar once per batch.
 
-    with tqdm(total=len(hostnames), desc="Resolving hostnames", unit="hostname") as pbar:
-        tasks = [
-            resolve_hostname_with_semaphore(semaphore, resolver, hostnames[i], country_codes[i], networks[i], results, log_filename, pbar, valid_names)
-            for i in range(len(hostnames))
-        ]
-        await asyncio.gather(*tasks)
+    Call it with flush=True to push any remaining count to the bar.
+    """
+    counter = [0]
 
-    results_df = pd.DataFrame(results, columns=["Hostname", "IPAddresses", "CountryCode", "Network"])
+    def progress(n=1, flush=False):
+        counter[0] += n
+        if counter[0] and (flush or counter[0] >= batch_size):
+            pbar.update(counter[0])
+            counter[0] = 0
 
-    # Combine IP addresses into a single line for each hostname
-    results_df["IPAddresses"] = results_df["IPAddresses"].apply(lambda x: ", ".join(x))
+    return progress
 
-    # Save valid names to a file
-    valid_names_filename = os.path.join(log_dir, "valid_names.txt")
-    with open(valid_names_filename, 'w') as f:
-        for name in sorted(valid_names):
-            f.write(f"{name}\n")
+def build_hostname(mcc, mnc):
+    """
+    Builds the ePDG hostname for an MCC/MNC pair.
+    """
+    return HOSTNAME_TEMPLATE % (int(mnc), int(mcc))
 
-    print(f"Resolved hostnames successfully. Valid names saved to {valid_names_filename}")
+def open_resolution_cache(path):
+    """
+    Opens (creating if needed) the SQLite cache of previous resolution results.
 
-    return results_df
+    Entries are keyed by the numeric (MCC, MNC) pair and hold the time of the
+    lookup and the resolved addresses, empty when DNS answered that the
+    hostname does not exist.
+    """
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS resolutions ("
+        "mcc INTEGER NOT NULL, mnc INTEGER NOT NULL, timestamp REAL NOT NULL, ips TEXT NOT NULL, "
+        "PRIMARY KEY (mcc, mnc))"
+    )
+    return conn
 
-def output_to_csv(results_df, log_dir):
+def load_recent_failures(conn, max_age=FAILED_LOOKUP_MAX_AGE):
     """
-    Outputs the resolved records to a CSV file.
+    Returns the (MCC, MNC) pairs found not to exist within the last max_age seconds.
     """
-    # Sort the DataFrame alphanumerically by the Hostname column
-    results_df = results_df.sort_values(by="Hostname")
+    cursor = conn.execute(
+        "SELECT mcc, mnc FROM resolutions WHERE ips = '' AND timestamp >= ?",
+        (time.time() - max_age,)
+    )
+    return set(cursor.fetchall())
+
+def store_resolutions(conn, resolutions):
+    """
+    Records ((MCC, MNC), resolved_ips, status) results from this run in the cache.
+
+    Lookups that ended in STATUS_ERROR say nothing about the hostname and are
+    not stored, so a resolver outage never turns into cached negatives.
+    """
+    now = time.time()
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO resolutions (mcc, mnc, timestamp, ips) VALUES (?, ?, ?, ?)",
+            (
+                (mcc, mnc, now, ",".join(ips))
+                for (mcc, mnc), ips, status in resolutions
+                if status != STATUS_ERROR
+            )
+        )
+
+def mcc_mnc_key(row):
+    """
+    Returns the numeric (MCC, MNC) pair used as the cache key for a row.
+    """
+    return int(row['MCC']), int(row['MNC'])
+
+async def write_results(result_queue, rows_by_hostname, output_file, valid_names_file):
+    """
+    Streams resolved records to the output files, sorted alphanumerically by hostname.
+
+    A result is held back until every hostname sorting before it has been
+    resolved. Memory therefore grows with how far completion order runs ahead
+    of sorted order: if the first hostname is also the last to finish, e.g.
+    because it times out, nearly every result is buffered until it arrives.
+    """
+    writer = csv.writer(output_file)
+    writer.writerow(RESULT_FIELDS)
+
+    order = sorted(rows_by_hostname)
+    next_index = 0
+    pending = {}
+    while next_index < len(order):
+        hostname, resolved_ips, status = await result_queue.get()
+        pending[hostname] = (resolved_ips, status)
+
+        while next_index < len(order) and order[next_index] in pending:
+            hostname = order[next_index]
+            resolved_ips, status = pending.pop(hostname)
+            next_index += 1
+
+            if resolved_ips:
+                valid_names_file.write(f"{hostname}\n")
+            # Combine IP addresses into a single line for each hostname
+            ip_addresses = ", ".join(resolved_ips)
+            writer.writerows(
+                (hostname, ip_addresses, row['Country Code'], row['Network'], status)
+                for row in rows_by_hostname[hostname]
+            )
+
+async def resolve_hostnames(rows, log_dir, resolver, concurrency=DEFAULT_CONCURRENCY, cache=None):
+    """
+    Resolves the hostname of every row and writes the results to a CSV file.
+
+    When a cache connection is given, hostnames that DNS recently reported as
+    not existing are skipped and written with STATUS_CACHED, and the outcome of
+    every new lookup is recorded.
+    """
+    # Several networks can share the same MCC/MNC, so only resolve each hostname once
+    rows_by_hostname = {}
+    for row in rows:
+        rows_by_hostname.setdefault(row['Hostname'], []).append(row)
+    max_workers = max(1, min(concurrency, len(rows_by_hostname)))
+    semaphore = asyncio.Semaphore(max_workers)
+    result_queue = asyncio.Queue()
+
+    to_resolve = list(rows_by_hostname)
+    if cache is not None:
+        recent_failures = load_recent_failures(cache)
+        to_resolve = [
+            hostname for hostname in rows_by_hostname
+            if mcc_mnc_key(rows_by_hostname[hostname][0]) not in recent_failures
+        ]
+        for hostname in rows_by_hostname.keys() - set(to_resolve):
+            result_queue.put_nowait((hostname, [], STATUS_CACHED))
+        print(f"Skipping {len(rows_by_hostname) - len(to_resolve)} hostnames that were recently not found")
 
     output_filename = os.path.join(log_dir, "hostname_resolution_results.csv")
-    results_df.to_csv(output_filename, index=False)
+    valid_names_filename = os.path.join(log_dir, "valid_names.txt")
+    with open(output_filename, 'w', newline='', buffering=OUTPUT_BUFFER_SIZE) as output_file, \
+            open(valid_names_filename, 'w') as valid_names_file:
+        writer_task = asyncio.create_task(
+            write_results(result_queue, rows_by_hostname, output_file, valid_names_file)
+        )
+        try:
+            with tqdm(total=len(to_resolve), desc="Resolving hostnames", unit="hostname", mininterval=0.2) as pbar:
+                progress = batched_progress(pbar)
+                tasks = [
+                    resolve_hostname_with_semaphore(semaphore, resolver, hostname, progress, result_queue)
+                    for hostname in to_resolve
+                ]
+                try:
+                    resolved = await asyncio.gather(*tasks)
+                finally:
+                    progress(0, flush=True)
+            await writer_task
+        finally:
+            writer_task.cancel()
+
+    if cache is not None:
+        store_resolutions(cache, (
+            (mcc_mnc_key(rows_by_hostname[hostname][0]), resolved_ips, status)
+            for hostname, (resolved_ips, status) in zip(to_resolve, resolved)
+        ))
+
+    print(f"Resolved hostnames successfully. Valid names saved to {valid_names_filename}")
     print(f"Results saved to {output_filename}")
 
-def scrape_mcc_mnc(log_dir):
+async def scrape_mcc_mnc(log_dir):
     url = 'https://www.mcc-mnc.com/'
-    response = requests.get(url)
-    soup = BeautifulSoup(response.content, 'html.parser')
+    timeout = aiohttp.ClientTimeout(total=SCRAPE_TIMEOUT)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        async with session.get(url) as response:
+            response.raise_for_status()
+            content = await response.read()
+    # Only build a tree for the MCC/MNC table, using lxml when it is installed
+    soup = BeautifulSoup(content, HTML_PARSER, parse_only=SoupStrainer('table', id='mncmccTable'))
     table = soup.find('table', {'id': 'mncmccTable'})
 
     rows = table.find_all('tr')[1:]  # skip the header row
     data = []
 
     for row in rows:
-        cols = row.find_all('td')
-        mcc = cols[0].text.strip()
-        mnc = cols[1].text.strip()
-        iso = cols[2].text.strip()
-        country = cols[3].text.strip()
-        country_code = cols[4].text.strip()
-        network = cols[5].text.strip()
+        cols = [td.text.strip() for td in row.find_all('td')]
+        mcc, mnc, iso, country, country_code, network = cols[:6]
         data.append({
             'MCC': mcc,
             'MNC': mnc,
@@ -138,23 +485,58 @@ def scrape_mcc_mnc(log_dir):
             'Country': country,
             'Country Code': country_code,
             'Network': network,
-            'Hostname': f"epdg.epc.mnc{mnc}.mcc{mcc}.pub.3gppnetwork.org"
+            'Hostname': build_hostname(mcc, mnc)
         })
 
-    df = pd.DataFrame(data)
+    # Write the scraped rows to a JSON snapshot, using orjson when it is installed
+    output_filename = os.path.join(log_dir, "mcc_mnc_data.json")
+    with open(output_filename, 'wb') as f:
+        if orjson is not None:
+            f.write(orjson.dumps(data))
+        else:
+            f.write(json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+    return data
 
-    # Write DataFrame to a CSV file with a timestamp
-    output_filename = os.path.join(log_dir, "mcc_mnc_data.csv")
-    df.to_csv(output_filename, index=False)
+def setup_logging(log_filename):
+    """
+    Routes log records through an in-memory queue to a file handler
+    running on a background listener thread, so the event loop never
+    touches the log file directly.
 
-    return df
+    Returns:
+        tuple: The installed QueueHandler and the started QueueListener; pass
+        both to teardown_logging() to flush and detach them.
+    """
+    log_queue = queue.SimpleQueue()
+    file_handler = logging.FileHandler(log_filename, 'a')
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+    listener = logging.handlers.QueueListener(log_queue, file_handler)
+
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    root.addHandler(queue_handler)
+    listener.start()
+    return queue_handler, listener
+
+def teardown_logging(queue_handler, listener):
+    """
+    Detaches the queue handler from the root logger and flushes the listener.
+    """
+    logging.getLogger().removeHandler(queue_handler)
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
 
-async def main(country_code_filter=None):
+async def main(country_code_filter=None, concurrency=DEFAULT_CONCURRENCY, cache_file=None):
     """
     Main function to orchestrate the resolution of hostnames and save results to a CSV file.
 
     Args:
         country_code_filter (str, optional): The country code to filter hostnames.
+        concurrency (int, optional): The maximum number of in-flight DNS lookups.
+        cache_file (str, optional): The SQLite cache of previous results; no cache is used when omitted.
     """
     timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
     if country_code_filter:
@@ -164,32 +546,43 @@ async def main(country_code_filter=None):
     os.makedirs(log_dir, exist_ok=True)
     
     log_filename = os.path.join(log_dir, "name_resolution_log.log")
-    logging.basicConfig(filename=log_filename, level=logging.INFO, format='%(asctime)s - %(message)s')
-
-    # Scrape the MCC MNC data
-    df = scrape_mcc_mnc(log_dir)
-
-    # Filter by country code if provided
-    if country_code_filter:
-        df = df[df['Country Code'] == country_code_filter]
+    queue_handler, listener = setup_logging(log_filename)
+    cache = None
 
-    # Print out the entire DataFrame and its columns for debugging
-    print("DataFrame after loading/scraping:")
-    print(df.head())  # Print the first few rows of the DataFrame
-    print("Columns in the DataFrame:", df.columns)
-
-    # Resolve the hostnames
-    results_df = await resolve_hostnames(df, log_filename, log_dir)
-
-    # Output the results to a CSV file
-    output_to_csv(results_df, log_dir)
+    try:
+        if cache_file:
+            cache = open_resolution_cache(cache_file)
+
+        # Scrape the MCC MNC data
+        rows = await scrape_mcc_mnc(log_dir)
+
+        # Filter by country code if provided
+        if country_code_filter:
+            rows = [row for row in rows if row['Country Code'] == country_code_filter]
+
+        # Print out the first few rows and the columns for debugging
+        print(f"Rows after loading/scraping: {len(rows)}")
+        for row in rows[:5]:
+            print(row)
+        print("Columns:", list(rows[0]) if rows else [])
+
+        # Resolve the hostnames and stream the results to a CSV file
+        await resolve_hostnames(rows, log_dir, get_resolver(), concurrency, cache)
+    finally:
+        await close_resolver()
+        if cache is not None:
+            cache.close()
+        teardown_logging(queue_handler, listener)
 
 # Run the main function
 if __name__ == "__main__":
-    import sys
-    country_code_filter = sys.argv[1] if len(sys.argv) > 1 else None
-
-    # Create a new event loop and set it as the current event loop
-    new_loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(new_loop)
-    new_loop.run_until_complete(main(country_code_filter))
+    import argparse
+    parser = argparse.ArgumentParser(description="Resolve 3GPP ePDG hostnames for WIFI calling.")
+    parser.add_argument("country_code", nargs="?", default=None, help="Only resolve networks with this dialing country code")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Maximum number of in-flight DNS lookups")
+    parser.add_argument("--cache-file", default=None, help="SQLite file remembering results between runs (disabled by default)")
+    args = parser.parse_args()
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+
+    asyncio.run(main(args.country_code, args.concurrency, args.cache_file))